@@ -1 +1,29 @@
-from .renderer import Chat, Logger, Path
\ No newline at end of file
+from .renderer import Chat, Logger, Path
+
+# the other modules pull in asyncio, sqlite3 etc., so they are imported on first use
+lazyAttributes = {
+    "Pages": "pages",
+    "Artifacts": "pages",
+    "VersionStore": "history",
+    "FileHistory": "history",
+    "Pipeline": "pipeline",
+    "DBSource": "pipeline",
+    "MemorySource": "pipeline",
+    "RenderToFile": "pipeline",
+    "RenderServer": "server",
+    "RenderCache": "server",
+    "Analytics": "analytics",
+    "PathIndex": "pathindex",
+    "Watcher": "watcher",
+    "MemoryBudget": "admission",
+    "CostModel": "admission",
+    "ParseCache": "cache",
+}
+
+
+def __getattr__(name):
+    if name in lazyAttributes:
+        from importlib import import_module
+
+        return getattr(import_module(f".{lazyAttributes[name]}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
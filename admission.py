@@ -0,0 +1,106 @@
+import asyncio
+import os
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from .renderer import Path
+
+
+class CostModel:
+    """
+    Rough upper bound of the memory needed to render a chat, from signals that
+    are cheap to get before parsing: the number of requests, the textEditGroup
+    chunks per edited file and the sizes of the edited files on disk.
+    Every edit group keeps another version of its file in Chat.files, and the
+    full-context diff holds about twice the file once more.
+    """
+
+    perRequest = 64 * 1024
+    perEditGroup = 16 * 1024
+    # Python strings and lists take several times the file size on disk
+    fileFactor = 4
+    fullDiffVersions = 2
+
+    @staticmethod
+    def fileSize(path):
+        try:
+            return os.stat(Path.resolve(path)).st_size
+        except OSError:
+            return 0
+
+    @classmethod
+    def editGroups(cls, doc):
+        return Counter(
+            chunk["uri"]["path"]
+            for request in doc["requests"]
+            for chunk in request.get("response", [])
+            if chunk.get("kind", None) == "textEditGroup"
+        )
+
+    @classmethod
+    def estimate(cls, doc):
+        cost = cls.perRequest * len(doc["requests"])
+        for path, nGroups in cls.editGroups(doc).items():
+            nVersions = 1 + nGroups + cls.fullDiffVersions
+            cost += cls.perEditGroup * nGroups
+            cost += cls.fileFactor * cls.fileSize(path) * nVersions
+        return cost
+
+
+class MemoryBudget:
+    """
+    Admits renders while the sum of their estimated costs fits into the budget,
+    later ones wait until enough earlier renders are done. Chats are admitted in
+    arrival order, so a waiting expensive chat is not overtaken by smaller ones.
+    A chat that does not fit into the whole budget is rendered in reduced mode,
+    on its own.
+    """
+
+    def __init__(self, budget, costModel=CostModel):
+        self.budget = budget
+        self.costModel = costModel
+        self.used = 0
+        self.condition = asyncio.Condition()
+        self.waiting = deque()
+        self.counters = {"admitted": 0, "delayed": 0, "reduced": 0}
+
+    def metrics(self):
+        return {
+            **self.counters,
+            "used": self.used,
+            "budget": self.budget,
+            "waiting": len(self.waiting),
+        }
+
+    @asynccontextmanager
+    async def admit(self, doc):
+        """
+        Waits until the chat can be rendered, yields whether to use reduced output.
+        """
+        cost = self.costModel.estimate(doc)
+        reduced = cost > self.budget
+        if reduced:
+            self.counters["reduced"] += 1
+            cost = self.budget
+
+        ticket = object()
+        async with self.condition:
+            self.waiting.append(ticket)
+            if self.waiting[0] is not ticket or self.used + cost > self.budget:
+                self.counters["delayed"] += 1
+            try:
+                await self.condition.wait_for(
+                    lambda: self.waiting[0] is ticket
+                    and self.used + cost <= self.budget
+                )
+            finally:
+                self.waiting.remove(ticket)
+                # the next chat in line may fit as well
+                self.condition.notify_all()
+            self.used += cost
+            self.counters["admitted"] += 1
+        try:
+            yield reduced
+        finally:
+            async with self.condition:
+                self.used -= cost
+                self.condition.notify_all()
@@ -0,0 +1,191 @@
+import math
+import os
+from .renderer import Path, Response, unpackRange
+
+
+class Table:
+    """
+    Column-wise accumulator, one list per column.
+    Strings default to "" and missing floats to nan so the columns stay typed.
+    String columns are kept variable-width (Arrow strings / object arrays),
+    fixed-width NumPy strings would pad every row to the longest one.
+    """
+
+    def __init__(self, **columns):
+        self.types = columns
+        self.columns = {name: [] for name in columns}
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()), []))
+
+    def append(self, **row):
+        for name, lst in self.columns.items():
+            lst.append(row[name])
+
+    def toArrays(self):
+        import numpy as np
+
+        return {
+            name: np.array(
+                lst,
+                dtype=object if self.types[name] is str else self.types[name],
+            )
+            for name, lst in self.columns.items()
+        }
+
+    def toArrow(self):
+        import numpy as np
+        import pyarrow as pa
+
+        return pa.table(
+            {
+                name: pa.array(
+                    lst,
+                    pa.string()
+                    if self.types[name] is str
+                    else pa.from_numpy_dtype(np.dtype(self.types[name])),
+                )
+                for name, lst in self.columns.items()
+            }
+        )
+
+
+class Analytics:
+    """
+    Extracts per-request, per-tool and per-edit records straight from chat-log
+    documents, using Response.classify but without building nodes, replaying
+    edits or rendering.
+    """
+
+    def __init__(self):
+        self.requests = Table(
+            chat=str,
+            request="int32",
+            responseId=str,
+            model=str,
+            elapsedMs="float64",
+            error=bool,
+            errorMessage=str,
+            nChunks="int32",
+            nTools="int32",
+        )
+        self.tools = Table(chat=str, request="int32", toolId=str, node=str)
+        self.edits = Table(
+            chat=str,
+            request="int32",
+            path=str,
+            nEdits="int32",
+            nLinesReplaced="int32",
+            nCharsInserted="int64",
+        )
+
+    def tables(self):
+        return {"requests": self.requests, "tools": self.tools, "edits": self.edits}
+
+    def addEdits(self, key, i, chunk):
+        edits = [edit for lst in chunk["edits"] for edit in lst]
+        nLinesReplaced = 0
+        for edit in edits:
+            startLineNumber, _, endLineNumber, _ = unpackRange(edit["range"])
+            nLinesReplaced += endLineNumber - startLineNumber + 1
+        self.edits.append(
+            chat=key,
+            request=i,
+            path=Path.format(chunk["uri"]["path"]),
+            nEdits=len(edits),
+            nLinesReplaced=nLinesReplaced,
+            nCharsInserted=sum(len(edit["text"]) for edit in edits),
+        )
+
+    def add(self, key, doc, models=None):
+        for i, request in enumerate(doc["requests"]):
+            result = request.get("result", {})
+            responseId = result.get("metadata", {}).get("responseId", "")
+            error = result.get("errorDetails", None)
+            chunks = request.get("response", [])
+            nTools = 0
+            for chunk in chunks:
+                kind = chunk.get("kind", None)
+                if kind == "toolInvocationSerialized":
+                    cls = Response.classify(chunk)
+                    self.tools.append(
+                        chat=key,
+                        request=i,
+                        toolId=chunk.get("toolId", ""),
+                        node=cls.__name__ if cls is not None else "",
+                    )
+                    nTools += 1
+                elif kind == "textEditGroup":
+                    self.addEdits(key, i, chunk)
+            elapsed = result.get("timings", {}).get("totalElapsed", None)
+            self.requests.append(
+                chat=key,
+                request=i,
+                responseId=responseId,
+                model=(models or {}).get(responseId, None) or "",
+                elapsedMs=elapsed if elapsed is not None else math.nan,
+                error=error is not None,
+                errorMessage=(error or {}).get("message", "") or "",
+                nChunks=len(chunks),
+                nTools=nTools,
+            )
+
+    @classmethod
+    def fromDocuments(cls, docs, models=None):
+        """
+        docs is an iterable of chat-log documents, they are not kept in memory.
+        """
+        analytics = cls()
+        for doc in docs:
+            analytics.add(doc["_key"], doc, models)
+        return analytics
+
+    def toArrays(self):
+        return {name: table.toArrays() for name, table in self.tables().items()}
+
+    def save(self, dirName):
+        """
+        Writes one Parquet file per table if pyarrow is available,
+        otherwise one NumPy .npz archive per table (string columns pickled).
+        """
+        os.makedirs(dirName, exist_ok=True)
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            pq = None
+
+        for name, table in self.tables().items():
+            if pq is not None:
+                pq.write_table(
+                    table.toArrow(), os.path.join(dirName, f"{name}.parquet")
+                )
+            else:
+                import numpy as np
+
+                np.savez_compressed(
+                    os.path.join(dirName, f"{name}.npz"), **table.toArrays()
+                )
+
+    @staticmethod
+    def load(dirName):
+        """
+        Returns {table: {column: array}} from a directory written by save.
+        """
+        import numpy as np
+
+        tables = {}
+        for fileName in sorted(os.listdir(dirName)):
+            name, ext = os.path.splitext(fileName)
+            path = os.path.join(dirName, fileName)
+            if ext == ".parquet":
+                import pyarrow.parquet as pq
+
+                table = pq.read_table(path)
+                tables[name] = {
+                    col: table.column(col).to_numpy() for col in table.column_names
+                }
+            elif ext == ".npz":
+                # string columns are object arrays
+                with np.load(path, allow_pickle=True) as f:
+                    tables[name] = dict(f)
+        return tables
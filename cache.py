@@ -0,0 +1,83 @@
+import gzip
+import os
+import pickle
+from .renderer import Chat, DB, Logger
+
+
+class ParseCache:
+    """
+    On-disk cache of parsed chats: the Request/Response nodes, the initial
+    file versions and the files resolved by the edit tools, so re-rendering
+    skips the DB fetch, chunk processing, model lookups and the edit replay.
+    Entries are pickled, so only load caches written by this renderer.
+    Entries written by a different Chat.parserVersion are ignored.
+    """
+
+    suffix = ".chat.gz"
+
+    def __init__(self, dirName):
+        self.dirName = dirName
+        os.makedirs(dirName, exist_ok=True)
+
+    def fileName(self, key):
+        return os.path.join(self.dirName, f"{key}{self.suffix}")
+
+    def keys(self):
+        return sorted(
+            fileName[: -len(self.suffix)]
+            for fileName in os.listdir(self.dirName)
+            if fileName.endswith(self.suffix)
+        )
+
+    def save(self, key, chat: Chat, rev=None):
+        """
+        Saves a chat after it has been rendered, since the edit tools
+        only resolve their files while rendering.
+        """
+        tmpName = self.fileName(key) + ".tmp"
+        with gzip.open(tmpName, "wb", compresslevel=1) as f:
+            pickle.dump(
+                (Chat.parserVersion, rev, chat), f, protocol=pickle.HIGHEST_PROTOCOL
+            )
+        os.replace(tmpName, self.fileName(key))
+
+    def load(self, key, rev=None):
+        """
+        Returns the cached chat, or None if there is no entry, it was written by
+        another parser version or (if rev is given) for another revision.
+        Unreadable entries (truncated, corrupt or pickled from classes that have
+        changed since) are also ignored, so render re-parses and overwrites them.
+        """
+        try:
+            with gzip.open(self.fileName(key), "rb") as f:
+                parserVersion, cachedRev, chat = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # e.g. OSError, zlib.error, EOFError, UnpicklingError, AttributeError
+            Logger.logger.warning(f"Ignoring unreadable cache entry {self.fileName(key)}")
+            Logger.logger.exception(e, exc_info=True)
+            return None
+        if parserVersion != Chat.parserVersion or (rev is not None and rev != cachedRev):
+            return None
+        chat.header = Chat.makeHeader(key)
+        Chat.instance = chat
+        return chat
+
+    def render(self, key, doc=None, models=None):
+        """
+        Yields the rendered lines of a chat from the cache if possible.
+        Otherwise the chat is parsed from doc (fetched if not given) and cached.
+        Without doc, cached entries are used regardless of their revision.
+        """
+        rev = doc.get("_rev", None) if doc is not None else None
+        chat = self.load(key, rev)
+        if chat is not None:
+            yield from chat.build().render()
+            return
+
+        if doc is None:
+            doc = DB.getChat(key)
+        chat = Chat(doc, header=Chat.makeHeader(key), models=models)
+        yield from chat.build().render()
+        self.save(key, chat, doc.get("_rev", None))
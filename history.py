@@ -0,0 +1,138 @@
+import gzip
+import json
+from .renderer import Chat, File
+
+
+class FileHistory:
+    """
+    Versions of a single file, stored as a full snapshot every `interval` versions
+    and as line deltas in between. Materializing a version applies at most
+    interval - 1 deltas to the closest preceding snapshot.
+    """
+
+    def __init__(self, interval=16):
+        self.interval = interval
+        self.snapshots = []
+        # deltas[k] turns version k - 1 into version k, None where a snapshot is taken
+        self.deltas = []
+        self.last = None
+
+    def __len__(self):
+        return len(self.deltas)
+
+    @staticmethod
+    def delta(a, b):
+        """
+        Edits are usually local, so a delta is the block between the common
+        prefix and suffix: (start, end, lines) replaces a[start:end] with lines.
+        """
+        n = min(len(a), len(b))
+        start = 0
+        while start < n and a[start] == b[start]:
+            start += 1
+        end = 0
+        while end < n - start and a[-end - 1] == b[-end - 1]:
+            end += 1
+        return (start, len(a) - end, b[start : len(b) - end])
+
+    @staticmethod
+    def applyDelta(buffer, delta):
+        start, end, lines = delta
+        return buffer[:start] + lines + buffer[end:]
+
+    def append(self, file: File):
+        if len(self.deltas) % self.interval == 0:
+            self.snapshots.append(file.buffer.copy())
+            self.deltas.append(None)
+        else:
+            self.deltas.append(self.delta(self.last, file.buffer))
+        self.last = file.buffer
+
+    def materialize(self, k) -> File:
+        if k < 0:
+            k += len(self)
+        if not 0 <= k < len(self):
+            raise IndexError(f"version {k} out of range")
+        base = k - k % self.interval
+        buffer = self.snapshots[base // self.interval]
+        for delta in self.deltas[base + 1 : k + 1]:
+            buffer = self.applyDelta(buffer, delta)
+        return File(buffer.copy())
+
+    def toDict(self):
+        return {"snapshots": self.snapshots, "deltas": self.deltas}
+
+    @classmethod
+    def fromDict(cls, obj, interval):
+        history = cls(interval)
+        history.snapshots = obj["snapshots"]
+        history.deltas = [
+            (delta[0], delta[1], delta[2]) if delta is not None else None
+            for delta in obj["deltas"]
+        ]
+        history.last = history.materialize(-1).buffer if history.deltas else None
+        return history
+
+
+class VersionStore:
+    """
+    FileHistory per path, built from Chat.files. Versions are numbered as in
+    Chat.files, i.e. version 0 is the file before the first edit.
+    """
+
+    formatVersion = 1
+
+    def __init__(self, interval=16):
+        self.interval = interval
+        self.files = {}
+
+    @classmethod
+    def fromChat(cls, chat: Chat, interval=16):
+        """
+        ToolEdit replays the edits while the chat is rendered,
+        so Chat.files only holds all versions after chat.build() has been rendered.
+        """
+        store = cls(interval)
+        for path, versions in chat.files.items():
+            history = FileHistory(interval)
+            for file in versions:
+                history.append(file)
+            store.files[path] = history
+        return store
+
+    def __contains__(self, path):
+        return path in self.files
+
+    def nVersions(self, path):
+        return len(self.files[path])
+
+    def materialize(self, path, k) -> File:
+        return self.files[path].materialize(k)
+
+    def save(self, fileName):
+        with gzip.open(fileName, "wt") as f:
+            json.dump(
+                {
+                    "formatVersion": self.formatVersion,
+                    "interval": self.interval,
+                    "files": {
+                        path: history.toDict() for path, history in self.files.items()
+                    },
+                },
+                f,
+            )
+
+    @classmethod
+    def load(cls, fileName):
+        with gzip.open(fileName, "rt") as f:
+            obj = json.load(f)
+        if obj["formatVersion"] != cls.formatVersion:
+            raise ValueError(
+                f"Unsupported version store format {obj['formatVersion']} in {fileName}"
+            )
+        store = cls(obj["interval"])
+        store.files = {
+            path: FileHistory.fromDict(history, store.interval)
+            for path, history in obj["files"].items()
+        }
+        return store
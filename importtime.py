@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# a small local chat that creates and edits a file, so rendering runs the diffs
+sampleDocument = {
+    "requesterUsername": "user",
+    "responderUsername": "assistant",
+    "requests": [
+        {
+            "result": {"metadata": {"responseId": ""}, "timings": {"totalElapsed": 0}},
+            "message": {"text": "Create a file"},
+            "variableData": {"variables": []},
+            "response": [
+                {"value": "Creating the file."},
+                {"kind": "toolInvocationSerialized", "toolId": "copilot_createFile"},
+                {
+                    "kind": "textEditGroup",
+                    "uri": {"path": "/tmp/example.py"},
+                    "edits": [
+                        [
+                            {
+                                "range": {
+                                    "startLineNumber": 1,
+                                    "startColumn": 1,
+                                    "endLineNumber": 1,
+                                    "endColumn": 1,
+                                },
+                                "text": "print('hello')\n",
+                            }
+                        ]
+                    ],
+                },
+            ],
+        }
+    ],
+}
+
+# runs in the fresh interpreter, prints the render time in ms
+renderScript = """
+import json, sys, time
+from {package} import Chat
+t0 = time.perf_counter()
+with open(sys.argv[1], "r") as f:
+    doc = json.load(f)
+# passing models skips the database lookups
+chat = Chat(doc, models={{}})
+for line in chat.build().render():
+    pass
+print((time.perf_counter() - t0) * 1000)
+"""
+
+
+def measure(package=__package__, document=None, runs=5):
+    """
+    Returns the cold start time in ms of importing the package and rendering a
+    local chat document in a fresh interpreter (best of runs). The import time is
+    the cumulative time python -X importtime reports for the package, the render
+    time includes the modules imported while rendering.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    pythonPath = os.environ.get("PYTHONPATH", None)
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join([root, pythonPath] if pythonPath else [root]),
+    }
+    if document is None:
+        fd, document = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(fd, "w") as f:
+            json.dump(sampleDocument, f)
+        removeDocument = True
+    else:
+        removeDocument = False
+
+    best = None
+    try:
+        for _ in range(runs):
+            proc = subprocess.run(
+                [
+                    sys.executable,
+                    "-X",
+                    "importtime",
+                    "-c",
+                    renderScript.format(package=package),
+                    document,
+                ],
+                env=env,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            importMs = None
+            for line in proc.stderr.splitlines():
+                # import time: self [us] | cumulative | imported package
+                fields = line.split("|")
+                if len(fields) == 3 and fields[2].strip() == package:
+                    importMs = int(fields[1]) / 1000
+            if importMs is None:
+                raise RuntimeError(
+                    f"python -X importtime reported no import of {package}"
+                )
+            renderMs = float(proc.stdout.strip().splitlines()[-1])
+            total = importMs + renderMs
+            best = total if best is None else min(best, total)
+    finally:
+        if removeDocument:
+            os.remove(document)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check that importing the renderer and rendering a local chat "
+        "stays within a time budget"
+    )
+    parser.add_argument("--package", default=__package__)
+    parser.add_argument(
+        "--document", default=None, help="chat-log JSON file, defaults to a small sample"
+    )
+    parser.add_argument("--budget-ms", type=float, default=80.0)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    ms = measure(args.package, args.document, args.runs)
+    print(f"import {args.package} and render: {ms:.1f} ms (budget {args.budget_ms:.1f} ms)")
+    sys.exit(0 if ms <= args.budget_ms else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -108,6 +108,17 @@ class Text(Container):
         def render(self):
             return f"`{self.content}`"
 
+    class Link(TextElement):
+        def __init__(self, content="", href=""):
+            super().__init__(content)
+            self.href = href
+
+        def render(self):
+            if isinstance(self.content, Text.TextElement):
+                return f"[{self.content.render()}]({self.href})"
+            else:
+                return f"[{self.content}]({self.href})"
+
     class Heading(TextElement):
         def __init__(self, level=1, content=""):
             self.level = level
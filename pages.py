@@ -0,0 +1,82 @@
+import os
+from itertools import chain
+from pathlib import PurePath
+from .renderer import Chat
+
+
+class Artifacts:
+    """
+    Writes blocks that are too large to be inlined into separate files
+    next to the rendered pages, so they can be linked instead.
+    """
+
+    def __init__(
+        self, root, subdir="artifacts", maxInlineLines=500, maxInlineBytes=64 * 1024
+    ):
+        self.root = root
+        self.subdir = subdir
+        self.maxInlineLines = maxInlineLines
+        self.maxInlineBytes = maxInlineBytes
+        self.count = 0
+
+    def write(self, lines, name, suffix):
+        self.count += 1
+        fileName = f"{self.count:04d}-{PurePath(name).name}{suffix}"
+        os.makedirs(os.path.join(self.root, self.subdir), exist_ok=True)
+        nLines = 0
+        with open(os.path.join(self.root, self.subdir, fileName), "w") as f:
+            for line in lines:
+                f.write(line + "\n")
+                nLines += 1
+        return f"{self.subdir}/{fileName}", nLines
+
+    def limit(self, lines, name, suffix):
+        """
+        Returns (lines, None, nLines) if the lines are small enough to be inlined,
+        otherwise writes them to a file and returns (None, href, nLines).
+        At most maxInlineLines lines are held in memory.
+        """
+        it = iter(lines)
+        head = []
+        size = 0
+        for line in it:
+            head.append(line)
+            size += len(line) + 1
+            if len(head) > self.maxInlineLines or size > self.maxInlineBytes:
+                href, nLines = self.write(chain(head, it), name, suffix)
+                return None, href, nLines
+        return head, None, len(head)
+
+
+class Pages:
+    def __init__(
+        self,
+        outDir,
+        requestsPerPage=10,
+        maxInlineLines=500,
+        maxInlineBytes=64 * 1024,
+    ):
+        self.outDir = outDir
+        self.requestsPerPage = requestsPerPage
+        self.maxInlineLines = maxInlineLines
+        self.maxInlineBytes = maxInlineBytes
+
+    @staticmethod
+    def pageName(i):
+        return "index.md" if i is None else f"page-{i + 1:04d}.md"
+
+    def write(self, chat: Chat):
+        os.makedirs(self.outDir, exist_ok=True)
+        Chat.instance = chat
+        chat.artifacts = Artifacts(
+            self.outDir,
+            maxInlineLines=self.maxInlineLines,
+            maxInlineBytes=self.maxInlineBytes,
+        )
+        names = []
+        # pages have to be rendered one after another, see Chat.buildPages
+        for name, doc in chat.buildPages(self.requestsPerPage, self.pageName):
+            with open(os.path.join(self.outDir, name), "w") as f:
+                f.writelines(doc.render())
+            names.append(name)
+        return names
@@ -0,0 +1,166 @@
+import sqlite3
+from .renderer import (
+    Path,
+    Response,
+    ToolCreateFile,
+    ToolEdit,
+    ToolFindFiles,
+    ToolReadFile,
+    ToolSearch,
+)
+
+
+class PathIndex:
+    """
+    Persistent index from formatted paths (Path.format) to the chats and requests
+    that touched them. Postings are (chat key, request index, action) with action
+    one of "created", "edited", "read", "searched", "found", "referenced".
+    Chats are re-indexed only when their _rev changes.
+    """
+
+    formatVersion = 1
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS chats (
+            key TEXT PRIMARY KEY,
+            rev TEXT
+        );
+        CREATE TABLE IF NOT EXISTS postings (
+            path TEXT NOT NULL,
+            chat TEXT NOT NULL,
+            request INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            PRIMARY KEY (path, chat, request, action)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS postingsChat ON postings (chat);
+    """
+
+    def __init__(self, fileName):
+        self.conn = sqlite3.connect(fileName)
+        self.conn.executescript(self.schema)
+        row = self.conn.execute(
+            "SELECT value FROM meta WHERE key = 'formatVersion'"
+        ).fetchone()
+        if row is None:
+            with self.conn:
+                self.conn.execute(
+                    "INSERT INTO meta VALUES ('formatVersion', ?)",
+                    (str(self.formatVersion),),
+                )
+        elif int(row[0]) != self.formatVersion:
+            raise ValueError(f"Unsupported path index format {row[0]} in {fileName}")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @staticmethod
+    def extract(doc):
+        """
+        Yields (path, request index, action) for a chat-log document,
+        without building nodes.
+        """
+        for i, request in enumerate(doc["requests"]):
+            tool = None
+            for chunk in request.get("response", []):
+                kind = chunk.get("kind", None)
+                if kind == "textEditGroup":
+                    action = "created" if tool is ToolCreateFile else "edited"
+                    yield chunk["uri"]["path"], i, action
+                    continue
+                if kind == "inlineReference":
+                    ref = chunk["inlineReference"]
+                    if "path" in ref:
+                        yield ref["path"], i, "referenced"
+                    continue
+                if kind != "toolInvocationSerialized":
+                    continue
+
+                tool = Response.classify(chunk)
+                if tool is ToolReadFile:
+                    uris = chunk.get("pastTenseMessage", {}).get("uris", {})
+                    for uri in uris.values():
+                        yield uri["path"], i, "read"
+                elif tool is not None and issubclass(tool, ToolSearch):
+                    action = "found" if tool is ToolFindFiles else "searched"
+                    for result in chunk.get("resultDetails", None) or []:
+                        path = ToolSearch.resultPath(result)
+                        if path is not None:
+                            yield path, i, action
+                elif tool is None or not issubclass(tool, ToolEdit):
+                    tool = None
+
+    def index(self, key, doc):
+        rev = doc.get("_rev", None)
+        row = self.conn.execute("SELECT rev FROM chats WHERE key = ?", (key,)).fetchone()
+        if row is not None and rev is not None and row[0] == rev:
+            return False
+        self.conn.execute("DELETE FROM postings WHERE chat = ?", (key,))
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO postings VALUES (?, ?, ?, ?)",
+            (
+                (Path.format(path), key, i, action)
+                for path, i, action in self.extract(doc)
+            ),
+        )
+        self.conn.execute("INSERT OR REPLACE INTO chats VALUES (?, ?)", (key, rev))
+        return True
+
+    def update(self, key, doc):
+        """
+        Re-indexes a chat if its revision changed, returns whether it did.
+        """
+        with self.conn:
+            return self.index(key, doc)
+
+    def updateMany(self, docs):
+        """
+        Indexes an iterable of documents in one transaction,
+        returns the number of re-indexed chats.
+        """
+        with self.conn:
+            return sum(self.index(doc["_key"], doc) for doc in docs)
+
+    def remove(self, key):
+        with self.conn:
+            self.conn.execute("DELETE FROM postings WHERE chat = ?", (key,))
+            self.conn.execute("DELETE FROM chats WHERE key = ?", (key,))
+
+    def revisions(self):
+        return dict(self.conn.execute("SELECT key, rev FROM chats"))
+
+    def query(self, path, action=None):
+        """
+        Returns [(chat key, request index, action)] for a path,
+        which is formatted with Path.format first.
+        """
+        sql = "SELECT chat, request, action FROM postings WHERE path = ?"
+        params = [Path.format(path)]
+        if action is not None:
+            sql += " AND action = ?"
+            params.append(action)
+        return self.conn.execute(sql + " ORDER BY chat, request", params).fetchall()
+
+    def queryPrefix(self, prefix, action=None):
+        """
+        Returns [(path, chat key, request index, action)] for all paths below a directory.
+        A configured root formats to "." and matches all paths.
+        """
+        prefix = Path.format(prefix).rstrip("/")
+        prefix = prefix + "/" if prefix != "." else ""
+        # all strings starting with prefix sort below prefix + U+10FFFF
+        sql = "SELECT path, chat, request, action FROM postings WHERE path >= ? AND path < ?"
+        params = [prefix, prefix + "\U0010ffff"]
+        if action is not None:
+            sql += " AND action = ?"
+            params.append(action)
+        return self.conn.execute(sql + " ORDER BY path, chat, request", params).fetchall()
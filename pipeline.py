@@ -0,0 +1,259 @@
+import asyncio
+import copy
+import os
+import time
+from .renderer import Chat, DB, Logger, Request
+
+
+class DBSource:
+    """
+    Async document source backed by the database,
+    the blocking client calls run in the default thread pool.
+    """
+
+    async def getDocument(self, key):
+        return await asyncio.to_thread(DB.getChat, key)
+
+    async def getModel(self, responseId):
+        return await asyncio.to_thread(Request.getModel, responseId)
+
+    async def getRevision(self, key):
+        return await asyncio.to_thread(DB.getRevision, "chat-logs", key)
+
+    async def getDocuments(self, keys):
+        return await asyncio.to_thread(lambda: list(DB.getChats(keys)))
+
+    async def getChanges(self, since=None, limit=100):
+        return await asyncio.to_thread(DB.getChanges, "chat-logs", since, limit)
+
+
+class MemorySource:
+    """
+    In-memory stand-in for DBSource, with an optional artificial latency per call.
+    Change stamps are ["", n] with n counting the calls to put.
+    """
+
+    def __init__(self, docs, models=None, latency=0.0):
+        self.docs = {}
+        self.stamps = {}
+        self.clock = 0
+        self.models = models or {}
+        self.latency = latency
+        for key, doc in docs.items():
+            self.put(key, doc)
+
+    def put(self, key, doc):
+        self.clock += 1
+        self.docs[key] = {**doc, "_key": key, "_rev": f"_m{self.clock}"}
+        self.stamps[key] = ("", self.clock)
+
+    async def getDocument(self, key):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        # Chat modifies the chunks while replaying edits
+        return copy.deepcopy(self.docs[key])
+
+    async def getModel(self, responseId):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.models.get(responseId, None)
+
+    async def getRevision(self, key):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        doc = self.docs.get(key, None)
+        return doc.get("_rev", None) if doc is not None else None
+
+    async def getDocuments(self, keys):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [copy.deepcopy(self.docs[key]) for key in keys if key in self.docs]
+
+    async def getChanges(self, since=None, limit=100):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        since = tuple(since) if since is not None else ("", -1)
+        changes = sorted(
+            (stamp, key) for key, stamp in self.stamps.items() if stamp > since
+        )
+        return [
+            {"key": key, "rev": self.docs[key]["_rev"], "stamp": list(stamp)}
+            for stamp, key in changes[:limit]
+        ]
+
+
+class RenderToFile:
+    def __init__(self, outDir):
+        self.outDir = outDir
+
+    def __call__(self, key, doc, models, reduced=False):
+        chat = Chat(doc, header=Chat.makeHeader(key), models=models, reduced=reduced)
+        fileName = os.path.join(self.outDir, f"{key}.md")
+        with open(fileName, "w") as f:
+            f.writelines(chat.build().render())
+        return fileName
+
+
+class StageMetrics:
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+        self.start = None
+        self.end = None
+
+    def begin(self):
+        if self.start is None:
+            self.start = time.monotonic()
+        return time.monotonic()
+
+    def done(self, t0, error=False):
+        self.end = time.monotonic()
+        self.busy += self.end - t0
+        self.count += 1
+        if error:
+            self.errors += 1
+
+    def toDict(self):
+        elapsed = (self.end - self.start) if self.start is not None else 0.0
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "busy": self.busy,
+            # time spent waiting on the next stage (back-pressure)
+            "blocked": self.blocked,
+            "elapsed": elapsed,
+            "throughput": self.count / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+async def getModels(source, doc, semaphore, stage=None):
+    """
+    Looks up the models of all requests of a chat concurrently, at most as many
+    at once as the semaphore allows. Failed lookups give None, like Request.getModel.
+    """
+    stage = stage or StageMetrics("models")
+
+    async def lookup(responseId):
+        async with semaphore:
+            t0 = stage.begin()
+            try:
+                model = await source.getModel(responseId)
+            except Exception:
+                stage.done(t0, error=True)
+                return responseId, None
+            stage.done(t0)
+            return responseId, model
+
+    responseIds = dict.fromkeys(
+        req["result"]["metadata"]["responseId"] for req in doc["requests"]
+    )
+    return dict(await asyncio.gather(*map(lookup, responseIds)))
+
+
+class Pipeline:
+    """
+    Fetches documents and their models concurrently and feeds them through a
+    bounded queue to the render workers. Fetching stalls while the queue is
+    full, so documents are not fetched faster than they can be rendered.
+
+    By default chats are rendered one at a time in Chat.renderExecutor. Pass a
+    ProcessPoolExecutor (and renderWorkers) to render several chats in parallel,
+    and a MemoryBudget to keep expensive chats from being rendered at the same time.
+    """
+
+    def __init__(
+        self,
+        source,
+        render,
+        fetchConcurrency=4,
+        modelConcurrency=16,
+        queueSize=4,
+        renderWorkers=1,
+        executor=None,
+        budget=None,
+    ):
+        self.source = source
+        self.render = render
+        self.fetchConcurrency = fetchConcurrency
+        self.modelConcurrency = modelConcurrency
+        self.queueSize = queueSize
+        self.renderWorkers = renderWorkers
+        self.executor = executor
+        self.budget = budget
+        self.stages = {
+            name: StageMetrics(name) for name in ("fetch", "models", "render")
+        }
+        self.results = {}
+
+    def metrics(self):
+        metrics = {name: stage.toDict() for name, stage in self.stages.items()}
+        if self.budget is not None:
+            metrics["budget"] = self.budget.metrics()
+        return metrics
+
+    async def getModels(self, doc, semaphore):
+        return await getModels(self.source, doc, semaphore, self.stages["models"])
+
+    async def fetcher(self, keys, queue, semaphore):
+        stage = self.stages["fetch"]
+        for key in keys:
+            t0 = stage.begin()
+            try:
+                doc = await self.source.getDocument(key)
+                models = await self.getModels(doc, semaphore)
+            except Exception as e:
+                stage.done(t0, error=True)
+                Logger.logger.warning(f"Could not fetch chat-logs/{key}")
+                Logger.logger.exception(e, exc_info=True)
+                continue
+            stage.done(t0)
+            t1 = time.monotonic()
+            await queue.put((key, doc, models))
+            stage.blocked += time.monotonic() - t1
+
+    async def renderer(self, queue, executor):
+        stage = self.stages["render"]
+        loop = asyncio.get_running_loop()
+        while (item := await queue.get()) is not None:
+            key, doc, models = item
+            t0 = stage.begin()
+            try:
+                if self.budget is None:
+                    self.results[key] = await loop.run_in_executor(
+                        executor, self.render, key, doc, models
+                    )
+                else:
+                    async with self.budget.admit(doc) as reduced:
+                        self.results[key] = await loop.run_in_executor(
+                            executor, self.render, key, doc, models, reduced
+                        )
+            except Exception as e:
+                stage.done(t0, error=True)
+                Logger.logger.warning(f"Could not render chat-logs/{key}")
+                Logger.logger.exception(e, exc_info=True)
+                continue
+            stage.done(t0)
+
+    async def run(self, keys):
+        queue = asyncio.Queue(maxsize=self.queueSize)
+        semaphore = asyncio.Semaphore(self.modelConcurrency)
+        keys = iter(keys)
+        executor = self.executor or Chat.renderExecutor()
+        renderers = [
+            asyncio.create_task(self.renderer(queue, executor))
+            for _ in range(self.renderWorkers)
+        ]
+        # the fetchers share the key iterator
+        await asyncio.gather(
+            *(
+                self.fetcher(keys, queue, semaphore)
+                for _ in range(self.fetchConcurrency)
+            )
+        )
+        for _ in renderers:
+            await queue.put(None)
+        await asyncio.gather(*renderers)
+        return self.results
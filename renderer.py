@@ -1,8 +1,6 @@
 import re
-import xml.etree.ElementTree as ET
-from collections import defaultdict, deque
-from difflib import unified_diff
-from arango import ArangoClient
+from collections import Counter, defaultdict
+from functools import lru_cache
 from operator import itemgetter
 from abc import ABC, abstractmethod
 from pathlib import PurePath
@@ -34,14 +32,107 @@ def fmtDuration(durationMs):
 class DB:
     addr = "http://project-db:8529"
 
+    @staticmethod
+    def getDatabase():
+        # importing the client is slow and not needed when rendering local documents
+        from arango import ArangoClient
+
+        return ArangoClient(DB.addr).db()
+
     @staticmethod
     def getCollection(coll):
-        return ArangoClient(DB.addr).db().collection(coll)
+        return DB.getDatabase().collection(coll)
 
     @staticmethod
     def getDocument(coll, key):
         return DB.getCollection(coll).get(key)
 
+    @staticmethod
+    def getRevision(coll, key):
+        cursor = DB.getDatabase().aql.execute(
+            "RETURN DOCUMENT(@@coll, @key)._rev",
+            bind_vars={"@coll": coll, "key": key},
+        )
+        return next(cursor, None)
+
+    # only the fields read by Chat, Request and Response
+    chatProjection = """
+        FOR d IN @@coll
+            FILTER d._key IN @keys
+            RETURN {
+                _key: d._key,
+                _rev: d._rev,
+                requesterUsername: d.requesterUsername,
+                responderUsername: d.responderUsername,
+                requests: (
+                    FOR r IN d.requests
+                        RETURN {
+                            message: {text: r.message.text},
+                            variableData: {
+                                variables: r.variableData.variables[* RETURN {name: CURRENT.name}]
+                            },
+                            result: MERGE(
+                                {
+                                    metadata: {responseId: r.result.metadata.responseId},
+                                    timings: {totalElapsed: r.result.timings.totalElapsed},
+                                },
+                                HAS(r.result, "errorDetails")
+                                    ? {errorDetails: KEEP(r.result.errorDetails, "message")}
+                                    : {}
+                            ),
+                            response: r.response,
+                        }
+                )
+            }
+    """
+
+    @staticmethod
+    def getChats(keys, coll="chat-logs", batchSize=20):
+        """
+        Fetches many chats in one query, projected to the fields the renderer uses.
+        Documents are streamed from the server in batches of batchSize,
+        in no particular order, missing keys are left out.
+        """
+        return DB.getDatabase().aql.execute(
+            DB.chatProjection,
+            bind_vars={"@coll": coll, "keys": list(keys)},
+            batch_size=batchSize,
+            stream=True,
+        )
+
+    @staticmethod
+    def getChat(key, coll="chat-logs"):
+        cursor = DB.getChats([key], coll)
+        try:
+            return next(cursor, None)
+        finally:
+            cursor.close(ignore_missing=True)
+
+    @staticmethod
+    def getChanges(coll, since=None, limit=100):
+        """
+        Returns up to limit {key, rev, stamp} of documents whose revision is newer
+        than since, ordered by stamp. The stamp is the [date, count] pair
+        of the hybrid logical clock encoded in _rev.
+        There is no index on the decoded revision, so every call scans and
+        decodes the _rev of the whole collection, only keys and revisions
+        are transferred. Keep the polling interval well above the query time
+        and ask for many changes at once, catching up costs one scan per call.
+        """
+        date, count = since or ("", -1)
+        cursor = DB.getDatabase().aql.execute(
+            """
+            FOR d IN @@coll
+                LET r = DECODE_REV(d._rev)
+                FILTER r.date > @date OR (r.date == @date AND r.count > @count)
+                SORT r.date, r.count
+                LIMIT @limit
+                RETURN {key: d._key, rev: d._rev, stamp: [r.date, r.count]}
+            """,
+            bind_vars={"@coll": coll, "date": date, "count": count, "limit": limit},
+        )
+        return list(cursor)
+
 
 class Path:
     home = PurePath("/home/p/Philip.Obi")
@@ -66,6 +157,7 @@ class Path:
         return result or path
 
     @staticmethod
+    @lru_cache(maxsize=1 << 16)
     def format(pathStr: str):
         return str(Path.splitRoot(PurePath(pathStr)))
 
@@ -110,7 +202,40 @@ class File:
         self.replaceString(obj)
 
 
+def diffLines(fileA: File, fileB: File, fmtPath, n=3):
+    from difflib import unified_diff
+
+    return unified_diff(
+        fileA.buffer,
+        fileB.buffer,
+        fromfile="a/" + fmtPath,
+        tofile="b/" + fmtPath,
+        n=n,
+        lineterm="",
+    )
+
+
+def diffBlock(lines, fmtPath, summary=None):
+    artifacts = Chat.instance.artifacts
+    if artifacts is not None:
+        lines, href, nLines = artifacts.limit(lines, fmtPath, ".diff")
+        if href is not None:
+            return Details(
+                Text(
+                    Text.Link(Text.Code(PurePath(href).name), href),
+                    Text.Text(f" ({nLines} lines)"),
+                ),
+                summary=summary,
+            )
+    return Details(
+        CodeBlock(lang="diff", codeLines=Append(lines, "")),
+        summary=summary,
+    )
+
+
 class Node(ABC):
+    fromIterator = False
+
     @abstractmethod
     def build(self):
         pass
@@ -128,30 +253,44 @@ class Container(Node):
 
 
 class Logger:
+    logger = logging.getLogger(__name__)
+
     @staticmethod
     def config():
-        logger = logging.getLogger(__name__)
+        """
+        Logs to stdout, to be called by the application (entry points, notebooks).
+        """
+        logger = Logger.logger
         logger.setLevel(logging.INFO)
-        handler = logging.StreamHandler(sys.stdout)
-        logger.addHandler(handler)
+        if not logger.handlers:
+            logger.addHandler(logging.StreamHandler(sys.stdout))
         return logger
 
-    logger = config()
-
 
 class Chat(Container):
     instance = None
+    executor = None
+    # to be increased whenever parsing changes, invalidates cached chats
+    parserVersion = 1
 
-    def __init__(self, doc, header=None):
+    def __init__(self, doc, header=None, workers=None, models=None, reduced=False):
         Chat.instance = self
         self.header = header
+        self.models = models
+        # reduced output: keep only the first and latest file versions, no full-context diff
+        self.reduced = reduced
         self.requesterUsername = doc["requesterUsername"]
         self.responderUsername = doc["responderUsername"]
         self.files = defaultdict(list)
         self.requestedFiles = set()
         self.editedFiles = set()
+        self.artifacts = None
 
-        super().__init__(content_it=[Request(req) for req in doc["requests"]])
+        if workers is None:
+            requests = [Request(req) for req in doc["requests"]]
+        else:
+            requests = self.parseParallel(doc["requests"], workers)
+        super().__init__(content_it=requests)
 
         for path in self.requestedFiles:
             resPath = Path.resolve(path)
@@ -167,71 +306,189 @@ class Chat(Container):
                 Logger.logger.exception(e, exc_info=True)
                 continue
 
+        # rendering appends the edited versions, see __getstate__
+        self.initialVersions = {path: len(versions) for path, versions in self.files.items()}
+
+    def __getstate__(self):
+        """
+        Pickles the parsed state: markdown nodes can only be rendered once, so the
+        header is left out, and the file versions appended while rendering are
+        dropped (the edit tools keep their resolved files instead).
+        """
+        state = self.__dict__.copy()
+        state["header"] = None
+        state["artifacts"] = None
+        state["files"] = defaultdict(
+            list,
+            {
+                path: versions[: self.initialVersions.get(path, 0)]
+                for path, versions in self.files.items()
+            },
+        )
+        return state
+
+    @staticmethod
+    def parseRequests(requests, models=None):
+        """
+        Runs in a worker process: parses a batch of requests against a bare Chat
+        that only collects the file bookkeeping done while parsing.
+        """
+        chat = Chat.__new__(Chat)
+        chat.models = models
+        chat.files = defaultdict(list)
+        chat.requestedFiles = set()
+        chat.editedFiles = set()
+        Chat.instance = chat
+        return (
+            [Request(req) for req in requests],
+            dict(chat.files),
+            chat.requestedFiles,
+            chat.editedFiles,
+        )
+
+    @staticmethod
+    def renderExecutor():
+        """
+        Chat keeps global state in Chat.instance, so only one chat can be built
+        and rendered at a time per process. Renders in the background (server,
+        watcher, pipeline) all run in this single shared thread.
+        """
+        if Chat.executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            Chat.executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="render"
+            )
+        return Chat.executor
+
+    def parseParallel(self, requests, workers, batchesPerWorker=4):
+        """
+        Parses the requests in a process pool. Edits are only replayed when
+        the chat is rendered, so merging the batches in order gives the same
+        state as parsing sequentially.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        from itertools import repeat
+
+        batchSize = max(1, -(-len(requests) // (workers * batchesPerWorker)))
+        batches = [
+            requests[i : i + batchSize] for i in range(0, len(requests), batchSize)
+        ]
+        parsed = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for batch, files, requestedFiles, editedFiles in executor.map(
+                Chat.parseRequests, batches, repeat(self.models)
+            ):
+                parsed.extend(batch)
+                # created files are inserted at the front while parsing
+                for path, versions in files.items():
+                    self.files[path][0:0] = versions
+                self.requestedFiles |= requestedFiles
+                self.editedFiles |= editedFiles
+        Chat.instance = self
+        return parsed
+
+    @staticmethod
+    def makeHeader(key):
+        return Text(Text.Text("Document ID: "), Text.Code(f"chat-logs/{key}"))
+
     @classmethod
-    def fromKey(cls, key):
+    def fromKey(cls, key, workers=None):
         return cls(
-            doc=DB.getDocument("chat-logs", key),
-            header=Text(Text.Text("Document ID: "), Text.Code(f"chat-logs/{key}")),
+            doc=DB.getChat(key),
+            header=Chat.makeHeader(key),
+            workers=workers,
         )
 
-    def build(self):
-        editedFilesBlock = None
-
+    def buildEditedFiles(self):
         editedFiles = self.editedFiles & set(self.files.keys())
 
-        if len(editedFiles) > 0:
+        if len(editedFiles) == 0:
+            return None
 
-            def func(path):
-                fmtPath = Path.format(path)
-                fileA = self.files[path][0]
-                fileB = self.files[path][-1]
-                fromfile = f"a/{fmtPath}"
-                tofile = f"b/{fmtPath}"
-                nLines = max(len(fileA.buffer), len(fileB.buffer))
-                return Wrapper(
-                    Text(Text.Code(fmtPath), Text.Text(":")),
-                    Details(
-                        CodeBlock(
-                            lang="diff",
-                            codeLines=Append(
-                                unified_diff(
-                                    fileA.buffer,
-                                    fileB.buffer,
-                                    fromfile=fromfile,
-                                    tofile=tofile,
-                                    lineterm="",
-                                ),
-                                "",
-                            ),
-                        ),
-                        summary="Squashed changes (short)",
-                    ),
-                    Details(
-                        CodeBlock(
-                            lang="diff",
-                            codeLines=Append(
-                                unified_diff(
-                                    fileA.buffer,
-                                    fileB.buffer,
-                                    fromfile=fromfile,
-                                    tofile=tofile,
-                                    n=nLines,
-                                    lineterm="",
-                                ),
-                                "",
-                            ),
-                        ),
+        def func(path):
+            fmtPath = Path.format(path)
+            fileA = self.files[path][0]
+            fileB = self.files[path][-1]
+            nLines = max(len(fileA.buffer), len(fileB.buffer))
+            return Wrapper(
+                Text(Text.Code(fmtPath), Text.Text(":")),
+                diffBlock(
+                    diffLines(fileA, fileB, fmtPath),
+                    fmtPath,
+                    summary="Squashed changes (short)",
+                ),
+                (
+                    diffBlock(
+                        diffLines(fileA, fileB, fmtPath, n=nLines),
+                        fmtPath,
                         summary="Squashed changes (full)",
-                    ),
-                )
-
-            editedFilesBlock = BlockquoteTag(
-                Text(Text.Heading(5, "Edited Files:")),
-                Wrapper(content_it=map(func, sorted(editedFiles, key=str.casefold))),
+                    )
+                    if not self.reduced
+                    else None
+                ),
             )
 
+        return BlockquoteTag(
+            Text(Text.Heading(5, "Edited Files:")),
+            Wrapper(content_it=map(func, sorted(editedFiles, key=str.casefold))),
+        )
+
+    def build(self):
         return Document(
-            self.header, Wrapper(content_it=self.buildContent()), editedFilesBlock
+            self.header, Wrapper(content_it=self.buildContent()), self.buildEditedFiles()
+        )
+
+    def buildPages(self, requestsPerPage, pageName):
+        """
+        Yields one Document per page of requests, followed by the index Document.
+        The index has to be rendered last since the squashed diffs depend on
+        the file versions collected while rendering the pages.
+        Nodes can only be rendered once, so the header only goes on the index.
+        """
+        pages = [
+            self.content[i : i + requestsPerPage]
+            for i in range(0, len(self.content), requestsPerPage)
+        ]
+        nPages = len(pages)
+
+        def nav(i):
+            links = [Text.Link("Index", pageName(None))]
+            if i > 0:
+                links.append(Text.Link("Previous", pageName(i - 1)))
+            if i < nPages - 1:
+                links.append(Text.Link("Next", pageName(i + 1)))
+            return Text(*Join(links, Text.Text(" | ")))
+
+        for i, requests in enumerate(pages):
+            yield pageName(i), Document(
+                nav(i),
+                Wrapper(content_it=map(lambda req: req.build(), requests)),
+                nav(i),
+            )
+
+        def entry(i):
+            start = i * requestsPerPage
+            end = start + len(pages[i])
+            yield Text(
+                Text.Link(
+                    f"Requests {start + 1}-{end}" if end > start + 1 else f"Request {end}",
+                    pageName(i),
+                ),
+                Text.Linebreak(),
+                *Join(
+                    (
+                        Text.Text(f"{start + j + 1}. {req.summary()}")
+                        for j, req in enumerate(pages[i])
+                    ),
+                    Text.Linebreak(),
+                ),
+            )
+
+        yield pageName(None), Document(
+            self.header,
+            Wrapper(content_it=(item for i in range(nPages) for item in entry(i))),
+            self.buildEditedFiles(),
         )
 
 
@@ -252,7 +509,13 @@ class Request(Container):
 
         result = request["result"]
         responseId = result["metadata"]["responseId"]
-        self.model = Request.getModel(responseId)
+        models = Chat.instance.models
+        # a given models mapping is complete, missing ids have no known model
+        self.model = (
+            models.get(responseId, None)
+            if models is not None
+            else Request.getModel(responseId)
+        )
         self.error = result.get("errorDetails", None)
         self.timeMs = result["timings"]["totalElapsed"]
         self.message = request["message"]["text"]
@@ -264,6 +527,10 @@ class Request(Container):
         )
         super().__init__(self.response)
 
+    def summary(self, maxLen=80):
+        line = self.message.strip().split("\n", 1)[0]
+        return line if len(line) <= maxLen else line[: maxLen - 3] + "..."
+
     def build(self):
         return Wrapper(
             BlockquoteTag(
@@ -308,60 +575,62 @@ class Request(Container):
 
 
 class Response(Container):
+    ignoredKinds = ("prepareToolInvocation", "codeblockUri", "progressTask")
+
+    @staticmethod
+    def classify(chunk):
+        """
+        Returns the Node class built from a chunk, or None if the chunk is unknown.
+        Classes with fromIterator set consume the chunk and the ones following it.
+        """
+        kind = chunk.get("kind", None)
+
+        # text block
+        if ("value" in chunk and kind is None) or kind == "inlineReference":
+            return ResponseText
+        match kind:
+            case "confirmation":
+                return Confirmation
+            case "progressTaskSerialized":
+                return ProgressTaskSerialized
+            case "toolInvocationSerialized":
+                match chunk["toolId"]:
+                    case "copilot_createFile":
+                        return ToolCreateFile
+                    case "copilot_insertEdit":
+                        return ToolInsertEdit
+                    case "copilot_replaceString":
+                        return ToolReplaceString
+                    case "copilot_readFile":
+                        return ToolReadFile
+                    case "copilot_findTextInFiles":
+                        return ToolFindTextInFiles
+                    case "copilot_searchCodebase":
+                        return ToolSearchCodebase
+                    case "copilot_findFiles":
+                        return ToolFindFiles
+                    case "copilot_getErrors":
+                        return ToolGetErrors
+                    case "copilot_runInTerminal":
+                        return ToolRunInTerminal
+        return None
+
     @staticmethod
     def processChunks(lst):
         it = Buffered(lst)
         for chunk in it:
-            obj = None
-
-            kind = chunk.get("kind", None)
+            if chunk.get("kind", None) in Response.ignoredKinds:
+                continue
 
-            # text block
-            if ("value" in chunk and kind is None) or kind == "inlineReference":
-                it.enqueue(chunk)
-                obj = ResponseText(it)
-            elif kind is not None:
-                match kind:
-                    case "prepareToolInvocation":
-                        continue
-                    case "codeblockUri":
-                        continue
-                    case "confirmation":
-                        obj = Confirmation(chunk)
-                    case "progressTaskSerialized":
-                        obj = ProgressTaskSerialized(chunk)
-                    case "progressTask":
-                        continue
-                    case "toolInvocationSerialized":
-                        toolId = chunk["toolId"]
-                        match toolId:
-                            case "copilot_createFile":
-                                it.enqueue(chunk)
-                                obj = ToolCreateFile(it)
-                            case "copilot_insertEdit":
-                                it.enqueue(chunk)
-                                obj = ToolInsertEdit(it)
-                            case "copilot_replaceString":
-                                it.enqueue(chunk)
-                                obj = ToolReplaceString(it)
-                            case "copilot_readFile":
-                                obj = ToolReadFile(chunk)
-                            case "copilot_findTextInFiles":
-                                obj = ToolFindTextInFiles(chunk)
-                            case "copilot_searchCodebase":
-                                obj = ToolSearchCodebase(chunk)
-                            case "copilot_findFiles":
-                                obj = ToolFindFiles(chunk)
-                            case "copilot_getErrors":
-                                obj = ToolGetErrors(chunk)
-                            case "copilot_runInTerminal":
-                                obj = ToolRunInTerminal(chunk)
-
-            if obj:
-                yield obj
-            else:
+            cls = Response.classify(chunk)
+            if cls is None:
                 Logger.logger.info("Unknown chunk encountered:")
                 Logger.logger.info(str(chunk))
+            elif cls.fromIterator:
+                it.enqueue(chunk)
+                yield cls(it)
+            else:
+                yield cls(chunk)
 
     def __init__(self, lst):
         super().__init__(*self.processChunks(lst))
@@ -384,6 +653,8 @@ class ProgressTaskSerialized(Node):
 
 
 class ResponseText(Container):
+    fromIterator = True
+
     class Text(Node):
         def __init__(self, doc):
             self.text = doc["value"]
@@ -452,24 +723,79 @@ class ToolReadFile(MessageNode):
 
 
 class ToolSearch(Container):
+    """
+    Only the first maxResults results are listed, the remaining ones are counted
+    per directory (the maxGroups largest directories are listed).
+    When paging, the full list is written to a separate file and linked.
+    """
+
+    maxResults = 200
+    maxGroups = 20
+
     def __init__(self, doc):
         self.message = doc["pastTenseMessage"]["value"]
         self.resultDetails = doc["resultDetails"]
 
-    def buildContent(self):
-        def func(result):
-            if "uri" in result and "range" in result:
-                sl, sc, el, ec = unpackRange(result["range"])
-                path = Path.format(result["uri"]["path"])
-                return Text.Code(f"{path}:{sl}:{sc}-{el}:{ec}")
-            elif "path" in result:
-                return Text.Code(Path.format(result["path"]))
-            else:
-                Logger.logger.warning("Unknown search result encountered")
-                Logger.logger.warning(result)
-                return None
+    @staticmethod
+    def resultPath(result):
+        if "uri" in result:
+            return result["uri"]["path"]
+        return result.get("path", None)
+
+    @staticmethod
+    def formatResult(result):
+        if "uri" in result and "range" in result:
+            sl, sc, el, ec = unpackRange(result["range"])
+            path = Path.format(result["uri"]["path"])
+            return Text.Code(f"{path}:{sl}:{sc}-{el}:{ec}")
+        elif "path" in result:
+            return Text.Code(Path.format(result["path"]))
+        else:
+            Logger.logger.warning("Unknown search result encountered")
+            Logger.logger.warning(result)
+            return None
+
+    def buildRest(self, rest):
+        groups = Counter(
+            path.rpartition("/")[0]
+            for path in map(self.resultPath, rest)
+            if path is not None
+        )
+        yield Text.Linebreak()
+        yield Text.Text(f"{len(rest)} more results in {len(groups)} directories:")
+        for dirPath, n in groups.most_common(self.maxGroups):
+            yield Text.Linebreak()
+            fmtPath = Path.format(dirPath)
+            # a root itself formats to ".", show it in full instead
+            yield Text.Code((fmtPath if fmtPath != "." else dirPath) + "/")
+            yield Text.Text(f" ({n})")
+        if len(groups) > self.maxGroups:
+            yield Text.Linebreak()
+            yield Text.Text(f"and {len(groups) - self.maxGroups} more directories")
+
+        artifacts = Chat.instance.artifacts
+        if artifacts is not None:
+            href, _ = artifacts.write(
+                (
+                    code.content
+                    for code in map(self.formatResult, self.resultDetails)
+                    if code is not None
+                ),
+                type(self).__name__,
+                ".txt",
+            )
+            yield Text.Linebreak()
+            yield Text.Link("Full list", href)
 
-        return Join(filter(None, map(func, self.resultDetails)), Text.Linebreak())
+    def buildContent(self):
+        shown = (
+            self.resultDetails
+            if self.maxResults is None
+            else self.resultDetails[: self.maxResults]
+        )
+        yield from Join(filter(None, map(self.formatResult, shown)), Text.Linebreak())
+        if len(self.resultDetails) > len(shown):
+            yield from self.buildRest(self.resultDetails[len(shown) :])
 
     def build(self):
         return BlockquoteTag(
@@ -516,30 +842,8 @@ class ToolRunInTerminal(Node):
         )
 
 
-class ToolFindFiles(Node):
-    def __init__(self, doc):
-        self.message = doc["pastTenseMessage"]["value"]
-        self.resultDetails = doc["resultDetails"]
-
-    def build(self):
-        return BlockquoteTag(
-            Text(Text.Text(self.message)),
-            (
-                Details(
-                    Text(
-                        content_it=Join(
-                            (
-                                Text.Code(Path.format(result["path"]))
-                                for result in self.resultDetails
-                            ),
-                            Text.Linebreak(),
-                        )
-                    )
-                )
-                if self.resultDetails
-                else None
-            ),
-        )
+class ToolFindFiles(ToolSearch):
+    maxResults = 100
 
 
 class ToolGetErrors(MessageNode):
@@ -547,6 +851,10 @@ class ToolGetErrors(MessageNode):
 
 
 class ToolEdit(Container):
+    fromIterator = True
+    # edited files, kept after the first render so cached chats skip the replay
+    resolved = None
+
     @staticmethod
     def getFileEdits(chunks):
         return filter(lambda chunk: chunk.get("kind", None) == "textEditGroup", chunks)
@@ -567,7 +875,13 @@ class ToolEdit(Container):
         return BlockquoteTag(content_it=self.buildContent())
 
     def buildContent(self):
-        editedFiles = self.editFiles()
+        if self.resolved is not None:
+            editedFiles = self.resolved
+        else:
+            editedFiles = self.editFiles()
+            # reduced output drops intermediate versions, don't hold on to them
+            if not Chat.instance.reduced:
+                self.resolved = editedFiles
 
         for path, file in editedFiles.items():
             fileVersions = Chat.instance.files[path]
@@ -575,22 +889,18 @@ class ToolEdit(Container):
             prev = fileVersions[-1] if fileVersions else None
             if prev is not None:
                 fmtPath = Path.format(path)
-                yield Details(
-                    CodeBlock(
-                        lang="diff",
-                        codeLines=Append(
-                            unified_diff(
-                                prev.buffer,
-                                file.buffer,
-                                lineterm="",
-                                fromfile="a/" + fmtPath,
-                                tofile="b/" + fmtPath,
-                            ),
-                            "",
-                        ),
-                    )
-                )
-            fileVersions.append(file)
+                yield diffBlock(diffLines(prev, file, fmtPath), fmtPath)
+            if Chat.instance.reduced and len(fileVersions) > 1:
+                fileVersions[-1] = file
+            else:
+                fileVersions.append(file)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.resolved is not None:
+            # only needed to replay the edits
+            state["chunks"] = []
+        return state
 
     def editFile(self, file: File, edits):
         pass
@@ -0,0 +1,265 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from urllib.parse import unquote
+from .renderer import Chat, Logger
+from .pipeline import DBSource, StageMetrics, getModels
+
+
+class RenderJob:
+    """
+    Output of a single render. Lines are appended from the render thread and
+    streamed to every client waiting on the same document revision.
+    """
+
+    def __init__(self):
+        self.lines = []
+        self.size = 0
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Event()
+
+    def notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def append(self, lines):
+        self.lines.extend(lines)
+        self.size += sum(map(len, lines))
+        self.notify()
+
+    def finish(self, error=None):
+        self.done = True
+        self.error = error
+        self.notify()
+
+    async def started(self):
+        """
+        Waits until the first lines are available or the render is done.
+        """
+        while not self.lines and not self.done:
+            await self.changed.wait()
+
+    async def stream(self):
+        i = 0
+        while True:
+            if i < len(self.lines):
+                n = len(self.lines)
+                yield self.lines[i:n]
+                i = n
+            elif self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            else:
+                await self.changed.wait()
+
+
+class RenderCache:
+    """
+    LRU cache of finished renders, keyed by (key, revision).
+    """
+
+    def __init__(self, maxEntries=64, maxBytes=512 * 1024**2):
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.entries = OrderedDict()
+        self.size = 0
+
+    def get(self, cacheKey):
+        job = self.entries.get(cacheKey, None)
+        if job is not None:
+            self.entries.move_to_end(cacheKey)
+        return job
+
+    def put(self, cacheKey, job: RenderJob):
+        if job.size > self.maxBytes:
+            return
+        if cacheKey in self.entries:
+            self.size -= self.entries.pop(cacheKey).size
+        self.entries[cacheKey] = job
+        self.size += job.size
+        while len(self.entries) > self.maxEntries or self.size > self.maxBytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= evicted.size
+
+
+class RenderServer:
+    """
+    Serves GET /chat/<key> by streaming Document.render output as it is produced,
+    and GET /metrics. Concurrent requests for the same revision share one render,
+    renders run in Chat.renderExecutor.
+    """
+
+    def __init__(self, source=None, cache=None, batchLines=256, modelConcurrency=16):
+        self.source = source or DBSource()
+        self.cache = cache or RenderCache()
+        self.batchLines = batchLines
+        self.modelSemaphore = asyncio.Semaphore(modelConcurrency)
+        self.modelStage = StageMetrics("models")
+        self.inflight = {}
+        self.counters = {
+            "requests": 0,
+            "cacheHits": 0,
+            "coalesced": 0,
+            "renders": 0,
+            "renderErrors": 0,
+            "sourceErrors": 0,
+            "notFound": 0,
+            "renderTime": 0.0,
+            "firstByteTime": 0.0,
+        }
+
+    def metrics(self):
+        return {
+            **self.counters,
+            "inflight": len(self.inflight),
+            "cacheEntries": len(self.cache.entries),
+            "cacheBytes": self.cache.size,
+            "models": self.modelStage.toDict(),
+        }
+
+    def renderLines(self, loop, job, key, doc, models):
+        t0 = time.monotonic()
+        batch = []
+        first = True
+        try:
+            chat = Chat(doc, header=Chat.makeHeader(key), models=models)
+            for line in chat.build().render():
+                batch.append(line)
+                # flush the first line right away to keep the time to first byte low
+                if first or len(batch) >= self.batchLines:
+                    if first:
+                        self.counters["firstByteTime"] += time.monotonic() - t0
+                        first = False
+                    loop.call_soon_threadsafe(job.append, batch)
+                    batch = []
+            if batch:
+                loop.call_soon_threadsafe(job.append, batch)
+        finally:
+            self.counters["renderTime"] += time.monotonic() - t0
+
+    async def render(self, key, cacheKey, job: RenderJob):
+        loop = asyncio.get_running_loop()
+        self.counters["renders"] += 1
+        try:
+            doc = await self.source.getDocument(key)
+            if doc is None:
+                raise KeyError(f"chat-logs/{key} not found")
+            models = await getModels(
+                self.source, doc, self.modelSemaphore, self.modelStage
+            )
+            await loop.run_in_executor(
+                Chat.renderExecutor(), self.renderLines, loop, job, key, doc, models
+            )
+        except Exception as e:
+            self.counters["renderErrors"] += 1
+            Logger.logger.warning(f"Could not render chat-logs/{key}")
+            Logger.logger.exception(e, exc_info=True)
+            job.finish(e)
+        else:
+            job.finish()
+            # the chat may have changed since its revision was looked up
+            self.cache.put((key, doc.get("_rev", cacheKey[1])), job)
+        finally:
+            del self.inflight[cacheKey]
+
+    async def getJob(self, key):
+        rev = await self.source.getRevision(key)
+        if rev is None:
+            return None
+        cacheKey = (key, rev)
+        if (job := self.cache.get(cacheKey)) is not None:
+            self.counters["cacheHits"] += 1
+        elif (job := self.inflight.get(cacheKey, None)) is not None:
+            self.counters["coalesced"] += 1
+        else:
+            job = self.inflight[cacheKey] = RenderJob()
+            asyncio.create_task(self.render(key, cacheKey, job))
+        return job
+
+    @staticmethod
+    async def respond(writer, status, contentType):
+        writer.write(
+            (
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: {contentType}\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode()
+        )
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        try:
+            requestLine = (await reader.readline()).decode("latin-1").split()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            if len(requestLine) < 2 or requestLine[0] != "GET":
+                await self.respond(writer, "405 Method Not Allowed", "text/plain")
+                return
+            self.counters["requests"] += 1
+            path = unquote(requestLine[1].split("?", 1)[0])
+            if path == "/metrics":
+                await self.respond(writer, "200 OK", "application/json")
+                writer.write(json.dumps(self.metrics()).encode())
+            elif path.startswith("/chat/") and (key := path[len("/chat/") :]):
+                try:
+                    job = await self.getJob(key)
+                except Exception as e:
+                    self.counters["sourceErrors"] += 1
+                    Logger.logger.warning(f"Could not look up chat-logs/{key}")
+                    Logger.logger.exception(e, exc_info=True)
+                    await self.respond(writer, "502 Bad Gateway", "text/plain")
+                    return
+                if job is None:
+                    self.counters["notFound"] += 1
+                    await self.respond(writer, "404 Not Found", "text/plain")
+                    return
+                # render errors before the first line can still be reported
+                await job.started()
+                if job.done and job.error is not None:
+                    await self.respond(
+                        writer, "500 Internal Server Error", "text/plain"
+                    )
+                    return
+                await self.respond(writer, "200 OK", "text/markdown; charset=utf-8")
+                try:
+                    async for lines in job.stream():
+                        writer.write("".join(lines).encode())
+                        await writer.drain()
+                except Exception:
+                    # headers are already sent, closing early signals the error
+                    pass
+            else:
+                self.counters["notFound"] += 1
+                await self.respond(writer, "404 Not Found", "text/plain")
+        except ConnectionError:
+            # the client disconnected
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8080):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render chat-logs on demand")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--cache-entries", type=int, default=64)
+    parser.add_argument("--cache-mb", type=int, default=512)
+    args = parser.parse_args()
+    Logger.config()
+    server = RenderServer(
+        cache=RenderCache(args.cache_entries, args.cache_mb * 1024**2)
+    )
+    asyncio.run(server.serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
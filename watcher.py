@@ -0,0 +1,234 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from .renderer import Chat, Logger
+from .pipeline import DBSource, RenderToFile, StageMetrics, getModels
+
+
+class WatcherState:
+    """
+    Watermark (stamp of the last processed change), the rendered revision
+    of every chat and the number of failed attempts of chats to be retried,
+    persisted as JSON so restarts resume where they stopped.
+    """
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.watermark = None
+        self.rendered = {}
+        self.failed = {}
+        if os.path.exists(fileName):
+            with open(fileName, "r") as f:
+                obj = json.load(f)
+            self.watermark = obj["watermark"]
+            self.rendered = obj["rendered"]
+            self.failed = obj.get("failed", {})
+
+    def save(self):
+        tmpName = self.fileName + ".tmp"
+        with open(tmpName, "w") as f:
+            json.dump(
+                {
+                    "watermark": self.watermark,
+                    "rendered": self.rendered,
+                    "failed": self.failed,
+                },
+                f,
+            )
+        os.replace(tmpName, self.fileName)
+
+
+class Watcher:
+    """
+    Polls the source for up to changeLimit chats whose _rev changed since the
+    stored watermark, fetches them in batches of batchSize and re-renders them.
+    Renders run in Chat.renderExecutor. Chats whose render failed are retried
+    once per interval, up to maxAttempts times.
+    """
+
+    def __init__(
+        self,
+        source,
+        render,
+        stateFile,
+        batchSize=50,
+        changeLimit=5000,
+        interval=30.0,
+        metricsFile=None,
+        maxAttempts=3,
+        modelConcurrency=16,
+    ):
+        self.source = source
+        self.render = render
+        self.state = WatcherState(stateFile)
+        self.batchSize = batchSize
+        self.changeLimit = changeLimit
+        self.interval = interval
+        self.metricsFile = metricsFile
+        self.maxAttempts = maxAttempts
+        self.modelSemaphore = asyncio.Semaphore(modelConcurrency)
+        self.modelStage = StageMetrics("models")
+        self.counters = {
+            "polls": 0,
+            "changes": 0,
+            "rendered": 0,
+            "skipped": 0,
+            "errors": 0,
+            "renderTime": 0.0,
+        }
+        self.lag = 0.0
+        self.caughtUp = False
+
+    def metrics(self):
+        c = self.counters
+        return {
+            **c,
+            "watermark": self.state.watermark,
+            # seconds between the newest processed change and the last poll,
+            # 0 once caught up
+            "lag": self.lag,
+            # whether the last poll listed less than changeLimit changes
+            "caughtUp": self.caughtUp,
+            "retries": len(self.state.failed),
+            "throughput": c["rendered"] / c["renderTime"] if c["renderTime"] else 0.0,
+            "models": self.modelStage.toDict(),
+        }
+
+    @staticmethod
+    def stampTime(stamp):
+        try:
+            return datetime.fromisoformat(stamp[0]).timestamp()
+        except (TypeError, ValueError, IndexError):
+            return None
+
+    def fail(self, key):
+        attempts = self.state.failed.get(key, 0) + 1
+        if attempts < self.maxAttempts:
+            self.state.failed[key] = attempts
+        else:
+            Logger.logger.warning(
+                f"Giving up on chat-logs/{key} after {attempts} attempts"
+            )
+            self.state.failed.pop(key, None)
+
+    async def renderBatch(self, keys):
+        loop = asyncio.get_running_loop()
+        docs = {doc["_key"]: doc for doc in await self.source.getDocuments(keys)}
+        for key in keys:
+            doc = docs.get(key, None)
+            if doc is None:
+                # removed since the change was listed
+                self.counters["skipped"] += 1
+                self.state.failed.pop(key, None)
+                continue
+            t0 = time.monotonic()
+            try:
+                models = await getModels(
+                    self.source, doc, self.modelSemaphore, self.modelStage
+                )
+                await loop.run_in_executor(
+                    Chat.renderExecutor(), self.render, key, doc, models
+                )
+            except Exception as e:
+                self.counters["errors"] += 1
+                Logger.logger.warning(f"Could not render chat-logs/{key}")
+                Logger.logger.exception(e, exc_info=True)
+                self.fail(key)
+            else:
+                self.counters["rendered"] += 1
+                self.state.rendered[key] = doc["_rev"]
+                self.state.failed.pop(key, None)
+            self.counters["renderTime"] += time.monotonic() - t0
+
+    async def poll(self):
+        """
+        Renders the changes listed since the watermark, batch by batch,
+        returns the number of changes listed.
+        """
+        self.counters["polls"] += 1
+        changes = await self.source.getChanges(self.state.watermark, self.changeLimit)
+        self.counters["changes"] += len(changes)
+        for i in range(0, len(changes), self.batchSize):
+            batch = changes[i : i + self.batchSize]
+            pending = []
+            for change in batch:
+                if self.state.rendered.get(change["key"], None) == change["rev"]:
+                    self.counters["skipped"] += 1
+                else:
+                    pending.append(change["key"])
+            if pending:
+                await self.renderBatch(pending)
+            self.state.watermark = batch[-1]["stamp"]
+            self.state.save()
+
+        self.caughtUp = len(changes) < self.changeLimit
+        stampTime = self.stampTime(self.state.watermark or [])
+        self.lag = (
+            time.time() - stampTime
+            if stampTime is not None and not self.caughtUp
+            else 0.0
+        )
+        self.saveMetrics()
+        return len(changes)
+
+    async def retry(self):
+        """
+        Re-renders the chats whose last render failed.
+        """
+        keys = list(self.state.failed)
+        for i in range(0, len(keys), self.batchSize):
+            await self.renderBatch(keys[i : i + self.batchSize])
+        if keys:
+            self.state.save()
+            self.saveMetrics()
+
+    def saveMetrics(self):
+        if self.metricsFile is not None:
+            with open(self.metricsFile, "w") as f:
+                json.dump(self.metrics(), f)
+
+    async def catchUp(self):
+        while await self.poll() == self.changeLimit:
+            pass
+
+    async def run(self):
+        while True:
+            try:
+                # chats that failed during the previous interval
+                await self.retry()
+                await self.catchUp()
+            except Exception as e:
+                self.counters["errors"] += 1
+                Logger.logger.warning("Polling for changes failed")
+                Logger.logger.exception(e, exc_info=True)
+            await asyncio.sleep(self.interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-render changed chat-logs")
+    parser.add_argument("outDir")
+    parser.add_argument("--state", default="watcher-state.json")
+    parser.add_argument("--metrics", default=None)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--change-limit", type=int, default=5000)
+    parser.add_argument("--interval", type=float, default=30.0)
+    args = parser.parse_args()
+    Logger.config()
+    os.makedirs(args.outDir, exist_ok=True)
+    watcher = Watcher(
+        DBSource(),
+        RenderToFile(args.outDir),
+        args.state,
+        batchSize=args.batch_size,
+        changeLimit=args.change_limit,
+        interval=args.interval,
+        metricsFile=args.metrics,
+    )
+    asyncio.run(watcher.run())
+
+
+if __name__ == "__main__":
+    main()